@@ -1,9 +1,16 @@
 import os
 import sys
 import zipfile
+import io
 import shutil
 import json
+import re
+import struct
 import argparse
+import threading
+import queue
+import pathlib
+from functools import partial
 from PIL import Image
 from tqdm import tqdm  # For progress bars
 import traceback
@@ -12,31 +19,258 @@ import traceback
 class AssetExtractionError(Exception):
     pass
 
-# Safe move function to handle filename conflicts
-def safe_move(src, dst):
-    """Move file with conflict resolution"""
-    if not os.path.exists(dst):
-        shutil.move(src, dst)
-        return dst
-        
-    base, ext = os.path.splitext(os.path.basename(src))
+def _claim_rename(src, dst):
+    """Move src to dst with a single rename, raising FileExistsError if dst is taken"""
+    # On Windows rename already refuses to overwrite an existing file
+    os.rename(src, dst)
+
+def _claim_link(src, dst):
+    """Move src to dst without overwriting, for platforms where rename(2) clobbers"""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        raise
+    except OSError:
+        # Filesystem without hard links: fall back to a checked rename
+        if os.path.exists(dst):
+            raise FileExistsError(dst)
+        os.rename(src, dst)
+        return
+    os.unlink(src)
+
+# Source and destination always share a filesystem here, so moves never
+# need shutil.move's copy fallback
+_claim = _claim_rename if os.name == 'nt' else _claim_link
+
+def _candidates(dst):
+    """Yield dst, then dst with _1, _2, ... appended to its base name"""
+    yield dst
+    base, ext = os.path.splitext(os.path.basename(dst))
     counter = 1
     while True:
-        new_name = f"{base}_{counter}{ext}"
-        new_path = os.path.join(os.path.dirname(dst), new_name)
-        if not os.path.exists(new_path):
-            shutil.move(src, new_path)
-            return new_path
+        yield os.path.join(os.path.dirname(dst), f"{base}_{counter}{ext}")
         counter += 1
 
+# Safe move function to handle filename conflicts
+def safe_move(src, dst):
+    """Move file with conflict resolution"""
+    for candidate in _candidates(dst):
+        try:
+            _claim(src, candidate)
+            return candidate
+        except FileExistsError:
+            continue
+
+def _reserve(dst, taken):
+    """Pick the first free conflict-resolved name for dst and mark it taken"""
+    for candidate in _candidates(dst):
+        if candidate not in taken:
+            taken.add(candidate)
+            return candidate
+
+def _scratch_name(index, filename):
+    """Per-member working name; the archive index keeps concurrent workers apart"""
+    return f".{index}.{filename}"
+
 # Check for safe extraction paths to prevent path traversal
 def is_safe_path(basedir, path):
     basedir = os.path.abspath(basedir)
     path = os.path.abspath(path)
     return path.startswith(basedir)
 
-def extract_assets(zip_path, output_dir, convert_images=True, organize_files=True):
-    """Extract and organize assets from game archive"""
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10 MB
+QUEUE_SIZE = 64  # Queued images are held as bytes: up to QUEUE_SIZE * MAX_IMAGE_SIZE (640 MB)
+COPY_BUFFER_SIZE = 1 << 20  # 1 MB; ZipFile.extract copies in 64 KB chunks
+MAX_IN_MEMORY_ARCHIVE = 256 * 1024 * 1024  # 256 MB
+
+CONVERTIBLE_EXTS = frozenset({'.pcx', '.bmp', '.img', '.gif'})
+SIZE_CHECKED_EXTS = CONVERTIBLE_EXTS | {'.png'}
+IMAGE_EXTS = frozenset({'.png', '.jpg', '.jpeg', '.gif'})
+SOUND_EXTS = frozenset({'.voc', '.wav', '.aud', '.mp3', '.ogg'})
+
+# One scan for all name hints instead of a substring search per keyword
+CLASSIFY_RE = re.compile(r'sprite|tile|background', re.IGNORECASE)
+
+def _classify_by_name(filename, dirs):
+    """Return the sprite or tile directory hinted at by filename, or None"""
+    found = {m.lower() for m in CLASSIFY_RE.findall(filename)}
+    if "sprite" in found:
+        return dirs["sprite"]
+    elif found:
+        return dirs["tile"]
+    return None
+
+def _load_archive(zip_path):
+    """Read the whole archive in one sequential read if it fits, else return its path"""
+    if os.path.getsize(zip_path) > MAX_IN_MEMORY_ARCHIVE:
+        return zip_path
+    with open(zip_path, 'rb') as f:
+        return f.read()
+
+def _open_archive(archive):
+    """Open a ZipFile over archive bytes or a path (BytesIO shares the bytes, no copy)"""
+    if isinstance(archive, bytes):
+        archive = io.BytesIO(archive)
+    return zipfile.ZipFile(archive, 'r')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_dims(path):
+    """Read (width, height) from a PNG's IHDR chunk, or None if it isn't a PNG"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if len(header) < 24 or header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+def _classify_dest(info, filename, file_ext, dirs, convert_images, classify_by_size=True):
+    """Pick a member's directory from its name: None keeps its archive path, pending awaits a size check"""
+    convertible = convert_images and file_ext in CONVERTIBLE_EXTS
+
+    # Large images are skipped by processing and left where they are
+    if convert_images and file_ext in SIZE_CHECKED_EXTS and info.file_size > MAX_IMAGE_SIZE:
+        return None
+    if convertible or file_ext in IMAGE_EXTS:
+        return _classify_by_name(filename, dirs) or dirs["pending" if classify_by_size else "other"]
+    elif file_ext in SOUND_EXTS:
+        return dirs["sound"]
+    return dirs["other"]
+
+def _extractor(archive, plan, q, errors):
+    """Producer: write planned members to their targets; images due for conversion are queued as bytes"""
+    try:
+        with _open_archive(archive) as zip_ref:
+            for i, info, file_ext, target, fallback in plan:
+                if fallback is not None:
+                    q.put((i, target, fallback, info, file_ext, zip_ref.read(info)))
+                    continue
+                with zip_ref.open(info) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+                q.put((i, target, None, info, file_ext, None))
+    except Exception as e:
+        errors.append(e)
+    finally:
+        # Always signal the end so consumers never block forever
+        q.put(None)
+
+def _consumer(q, process, results, errors, pbar):
+    """Consumer: process queued files until the end-of-stream marker arrives"""
+    while True:
+        item = q.get()
+        if item is None:
+            q.put(None)  # Pass the marker on to the remaining consumers
+            break
+        i, file_path, fallback, info, file_ext, data = item
+        try:
+            results[i] = process(file_path, fallback, info, file_ext, data)
+        except Exception as e:
+            errors.append(e)
+        pbar.update(1)
+
+def _process_one(file_path, fallback, info, file_ext, data, out_base, dirs, dir_to_type, convert_images, organize_files,
+                 classify_by_size=True):
+    """Convert and organize a single file; returns its manifest record, counters and any path left to move"""
+    stats = {"converted": 0, "skipped": 0, "failed": 0}
+    staged = None
+        
+    filename = os.path.basename(info.filename)  # Member name; file_path may be suffixed or scratch
+    dest_dir = dirs["other"]
+    img_size = None  # Captured during conversion so classification needn't reopen
+    
+    # Skip large images to avoid memory issues
+    if file_ext in SIZE_CHECKED_EXTS and convert_images:
+        if info.file_size > MAX_IMAGE_SIZE:
+            print(f"⛔ Skipping large image: {filename} ({info.file_size/1024/1024:.2f}MB)")
+            stats["skipped"] += 1
+            return None, stats, None
+        
+    # Process images; bytes arrive only for members the planner chose to convert
+    if data is not None:
+        try:
+            # Convert to PNG
+            if file_ext != '.png':
+                with Image.open(io.BytesIO(data)) as img:
+                    img_size = img.size
+                    if img.mode == 'P' and 'transparency' not in img.info:
+                        pass  # Keep the native palette: smaller buffer, indexed PNG
+                    # Preserve transparency if available
+                    elif img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+                        img = img.convert('RGBA')
+                    else:
+                        img = img.convert('RGB')
+                        # DOS-era art rarely exceeds 256 colours; index it when that's lossless
+                        if img.getcolors(256) is not None:
+                            img = img.convert('P', palette=Image.ADAPTIVE, colors=256)
+                        
+                    # file_path is already the planned PNG name
+                    with open(file_path, 'wb') as out:
+                        # Fast zlib level; optimize=True costs many times the save time
+                        img.save(out, format='PNG', compress_level=1, optimize=False)
+                    data = None
+                    filename = str(pathlib.PurePath(filename).with_suffix('.png'))
+                    stats["converted"] += 1
+                # Update extension after conversion
+                file_ext = '.png'
+            else:
+                stats["skipped"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"⚠️ Couldn't convert {filename}: {str(e)}")
+            # Print traceback for debugging
+            traceback.print_exc()
+
+    # Conversion failed or was skipped: keep the original bytes on disk
+    if data is not None:
+        file_path = fallback
+        with open(file_path, 'wb') as out:
+            out.write(data)
+    
+    # Organize files
+    if organize_files:
+        if file_ext in IMAGE_EXTS:
+            name_dir = _classify_by_name(filename, dirs)
+            if name_dir is not None:
+                dest_dir = name_dir
+            elif classify_by_size:
+                # Try to auto-classify by dimensions
+                try:
+                    if img_size is None and file_ext == '.png':
+                        img_size = _png_dims(file_path)
+                    if img_size is None:
+                        with Image.open(file_path) as img:
+                            img_size = img.size
+                    w, h = img_size
+                    if w <= 64 and h <= 64:  # Likely sprite
+                        dest_dir = dirs["sprite"]
+                    elif w >= 128 or h >= 128:  # Likely background/tile
+                        dest_dir = dirs["tile"]
+                except:
+                    pass
+        elif file_ext in SOUND_EXTS:
+            dest_dir = dirs["sound"]
+        
+        # Only pending images and failed conversions change directory here;
+        # their final names are claimed after all workers finish
+        if pathlib.PurePath(file_path).parent != pathlib.PurePath(dest_dir):
+            staged, file_path = file_path, os.path.join(dest_dir, filename)
+
+    # Add to manifest
+    p = pathlib.PurePath(file_path)
+    return {
+        "type": dir_to_type.get(p.parent, "other"),
+        "path": str(p.relative_to(out_base)),
+        "filename": p.name,
+        "original_path": os.path.normpath(info.filename),  # original path might be different
+        "format": file_ext[1:] if file_ext else ""  # Remove dot if exists
+    }, stats, staged
+
+def extract_assets(zip_path, output_dir, convert_images=True, organize_files=True, fast=False):
+    """Extract and organize assets from game archive
+
+    fast skips image conversion and classifies by filename and extension only.
+    """
+    if fast:
+        convert_images = False
     try:
         print(f"🔧 Starting asset extraction from {zip_path}")
         
@@ -57,124 +291,125 @@ def extract_assets(zip_path, output_dir, convert_images=True, organize_files=Tru
             os.makedirs(sound_dir, exist_ok=True)
             os.makedirs(other_dir, exist_ok=True)
         
-        # Extract ZIP contents with progress bar
-        extracted_files = []
-        print(f"📦 Extracting archive contents...")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            file_list = zip_ref.namelist()
-            for file in tqdm(file_list, desc="Extracting"):
-                # Prevent path traversal by ensuring the extracted file is within output_dir
-                dest_path = os.path.join(output_dir, file)
-                if not is_safe_path(output_dir, dest_path):
-                    print(f"⛔ Blocked unsafe extraction: {file}")
-                    continue
-                    
-                zip_ref.extract(file, output_dir)
-                extracted_files.append(dest_path)
-        
-        print(f"✅ Extracted {len(extracted_files)} files")
+        # Extract and process in a pipeline: one extractor feeds a pool of converters
+        print(f"📦 Extracting and processing archive contents...")
+        archive = _load_archive(zip_path)
+        with _open_archive(archive) as zip_ref:
+            infos = zip_ref.infolist()
 
-        # Process files
-        asset_index = []
-        conversion_stats = {"converted": 0, "skipped": 0, "failed": 0}
-        MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10 MB
-        
-        print("🔄 Processing assets...")
-        for file_path in tqdm(extracted_files, desc="Processing"):
-            if not os.path.isfile(file_path):
+        # Prevent path traversal by ensuring the extracted file is within output_dir
+        safe_infos = []
+        for info in infos:
+            if not is_safe_path(output_dir, os.path.join(output_dir, info.filename)):
+                print(f"⛔ Blocked unsafe extraction: {info.filename}")
                 continue
-                
-            filename = os.path.basename(file_path)
-            dest_dir = other_dir
+            safe_infos.append(info)
+
+        # Classify members by name up front so most land directly in their final directory
+        dirs = {"sprite": sprite_dir, "tile": tile_dir, "sound": sound_dir, "other": other_dir,
+                "pending": os.path.join(output_dir, "_pending")}
+        # Assign final names serially, in archive order, so _1, _2, ... suffixes
+        # are reproducible no matter which worker finishes first
+        taken = set()
+        if organize_files:
+            for d in (sprite_dir, tile_dir, sound_dir, other_dir):
+                taken.update(os.path.join(d, name) for name in os.listdir(d))
+        else:
+            # Raw members keep their archive paths; converted PNGs must avoid them
+            taken.update(os.path.join(output_dir, info.filename) for info in safe_infos if not info.is_dir())
+        plan = []
+        for i, info in enumerate(safe_infos):
+            if info.is_dir():
+                continue  # Parent directories are created below
+            # Split the name once and share it between the checks below
+            filename = os.path.basename(info.filename)
             file_ext = os.path.splitext(filename)[1].lower()
-            original_path = file_path  # Keep track of original path for manifest
-            
-            # Skip large images to avoid memory issues
-            if file_ext in ('.pcx', '.bmp', '.img', '.gif', '.png') and convert_images:
-                if os.path.getsize(file_path) > MAX_IMAGE_SIZE:
-                    print(f"⛔ Skipping large image: {filename} ({os.path.getsize(file_path)/1024/1024:.2f}MB)")
-                    conversion_stats["skipped"] += 1
-                    continue
-                
-            # Process images
-            if file_ext in ('.pcx', '.bmp', '.img', '.gif') and convert_images:
-                try:
-                    # Convert to PNG
-                    if file_ext != '.png':
-                        with Image.open(file_path) as img:
-                            new_path = os.path.splitext(file_path)[0] + '.png'
-                            
-                            # Preserve transparency if available
-                            if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
-                                img = img.convert('RGBA')
-                            else:
-                                img = img.convert('RGB')
-                                
-                            img.save(new_path)
-                            os.remove(file_path)
-                            file_path = new_path
-                            filename = os.path.basename(new_path)
-                            conversion_stats["converted"] += 1
-                        # Update extension after conversion
-                        file_ext = '.png'
-                    else:
-                        conversion_stats["skipped"] += 1
-                except Exception as e:
-                    conversion_stats["failed"] += 1
-                    print(f"⚠️ Couldn't convert {filename}: {str(e)}")
-                    # Print traceback for debugging
-                    traceback.print_exc()
-            
-            # Organize files
-            if organize_files:
-                if file_ext in ('.png', '.jpg', '.jpeg', '.gif'):
-                    if "sprite" in filename.lower():
-                        dest_dir = sprite_dir
-                    elif "tile" in filename.lower() or "background" in filename.lower():
-                        dest_dir = tile_dir
-                    else:
-                        # Try to auto-classify by dimensions
-                        try:
-                            with Image.open(file_path) as img:
-                                w, h = img.size
-                                if w <= 64 and h <= 64:  # Likely sprite
-                                    dest_dir = sprite_dir
-                                elif w >= 128 or h >= 128:  # Likely background/tile
-                                    dest_dir = tile_dir
-                        except:
-                            pass
-                elif file_ext in ('.voc', '.wav', '.aud', '.mp3', '.ogg'):
-                    dest_dir = sound_dir
-                
-                # Move to organized directory if not already there
-                dest_path = os.path.join(dest_dir, filename)
-                if file_path != dest_path:
-                    file_path = safe_move(file_path, dest_path)
-            
-            # Add to manifest
-            asset_type = "other"
-            if file_path.startswith(sprite_dir):
-                asset_type = "sprite"
-            elif file_path.startswith(tile_dir):
-                asset_type = "tile"
-            elif file_path.startswith(sound_dir):
-                asset_type = "sound"
-                
-            asset_index.append({
-                "type": asset_type,
-                "path": os.path.relpath(file_path, output_dir),
-                "filename": filename,
-                "original_path": os.path.relpath(original_path, output_dir),  # original path might be different
-                "format": file_ext[1:] if file_ext else ""  # Remove dot if exists
-            })
+            dest_dir = (_classify_dest(info, filename, file_ext, dirs, convert_images, not fast)
+                        if organize_files else None)
+            archive_path = os.path.join(output_dir, info.filename)
+            # Images due for conversion are decoded straight from the archive; the
+            # fallback is where their raw bytes go if conversion fails
+            fallback = None
+            out_name = filename
+            if convert_images and file_ext in CONVERTIBLE_EXTS and info.file_size <= MAX_IMAGE_SIZE:
+                fallback = os.path.join(dirs["pending"], _scratch_name(i, filename)) if organize_files else archive_path
+                out_name = os.path.splitext(filename)[0] + '.png'
+            if dest_dir == dirs["pending"]:
+                target = os.path.join(dest_dir, _scratch_name(i, out_name))
+            elif dest_dir is not None:
+                target = _reserve(os.path.join(dest_dir, out_name), taken)
+            elif fallback is not None:
+                target = _reserve(os.path.join(os.path.dirname(archive_path), out_name), taken)
+            else:
+                target = archive_path  # Stays where ZipFile.extract would put it
+            plan.append((i, info, file_ext, target, fallback))
+
+        # Create each containing directory once, up front, so workers never race on makedirs
+        needed_dirs = {os.path.dirname(target) for i, info, file_ext, target, fallback in plan}
+        needed_dirs.update(os.path.dirname(fallback) for i, info, file_ext, target, fallback in plan
+                           if fallback is not None)
+        for d in needed_dirs:
+            os.makedirs(d, exist_ok=True)
+
+        conversion_stats = {"converted": 0, "skipped": 0, "failed": 0}
+        # Asset type by containing directory, looked up once per file
+        dir_to_type = {pathlib.PurePath(sprite_dir): "sprite", pathlib.PurePath(tile_dir): "tile",
+                       pathlib.PurePath(sound_dir): "sound", pathlib.PurePath(other_dir): "other"}
+        process = partial(_process_one, out_base=pathlib.PurePath(output_dir), dirs=dirs, dir_to_type=dir_to_type,
+                          convert_images=convert_images, organize_files=organize_files,
+                          classify_by_size=not fast)
+
+        # Bounded queue caps members in flight; queued images hold their bytes in memory
+        q = queue.Queue(maxsize=QUEUE_SIZE)
+        results = [None] * len(safe_infos)  # Indexed by archive order
+        errors = []
+        # Cap refreshes at ~200 and skip the bar entirely when output isn't a terminal
+        with tqdm(total=len(plan), desc="Processing", miniters=max(1, len(plan) // 200),
+                  mininterval=0.1, disable=not sys.stdout.isatty()) as pbar:
+            producer = threading.Thread(target=_extractor, args=(archive, plan, q, errors))
+            # Pillow releases the GIL while decoding/encoding, so threads scale here
+            consumers = [threading.Thread(target=_consumer, args=(q, process, results, errors, pbar))
+                         for _ in range(os.cpu_count() or 1)]
+            producer.start()
+            for t in consumers:
+                t.start()
+            producer.join()
+            for t in consumers:
+                t.join()
+        if errors:
+            raise errors[0]
+
+        print(f"✅ Extracted and processed {len(safe_infos)} files")
+
+        results = [r for r in results if r is not None]
+        for _, stats, _ in results:
+            for key in conversion_stats:
+                conversion_stats[key] += stats[key]
+
+        # Claim names for the files that changed directory, again in archive order
+        for record, _, staged in results:
+            if staged is not None:
+                final_path = safe_move(staged, os.path.join(output_dir, record["path"]))
+                record["path"] = os.path.relpath(final_path, output_dir)
+                record["filename"] = os.path.basename(final_path)
+        asset_index = [record for record, _, _ in results if record is not None]
         
         # Clean up empty directories
         print("🧹 Cleaning up empty directories...")
-        for root, dirs, files in os.walk(output_dir, topdown=False):
-            for dir in dirs:
-                dir_path = os.path.join(root, dir)
-                if not os.listdir(dir_path):
-                    os.rmdir(dir_path)
+        # Only directories this run created can have been left empty, so try
+        # those (deepest first) instead of walking every file in the tree
+        candidate_empty_dirs = set()
+        for d in needed_dirs | set(dirs.values()):
+            # Work relative to output_dir so "." and "./" bases behave like any other
+            rel = os.path.relpath(d, output_dir)
+            while rel not in ('', os.curdir, os.pardir) and not rel.startswith(os.pardir + os.sep):
+                candidate_empty_dirs.add(rel)
+                rel = os.path.dirname(rel)
+        for rel in sorted(candidate_empty_dirs, key=lambda r: r.count(os.sep), reverse=True):
+            try:
+                os.rmdir(os.path.join(output_dir, rel))  # Fails cheaply with ENOTEMPTY without listing
+            except OSError:
+                pass
         
         # Create asset manifest
         manifest_path = os.path.join(output_dir, "manifest.json")
@@ -182,12 +417,12 @@ def extract_assets(zip_path, output_dir, convert_images=True, organize_files=Tru
             json.dump({
                 "assets": asset_index,
                 "stats": {
-                    "total_files": len(extracted_files),
+                    "total_files": len(safe_infos),
                     "images_converted": conversion_stats["converted"],
                     "images_failed": conversion_stats["failed"],
                     "images_skipped": conversion_stats["skipped"]
                 }
-            }, f, indent=2)
+            }, f, separators=(',', ':'))  # Compact: the manifest is machine-read
             
         print(f"🎉 Assets successfully organized in {output_dir}")
         print(f"📄 Manifest created at {manifest_path}")
@@ -207,6 +442,8 @@ def main():
                         help='Skip image conversion to PNG')
     parser.add_argument('--no-organize', action='store_false', dest='organize_files',
                         help='Skip file organization')
+    parser.add_argument('--fast', action='store_true',
+                        help='Skip image conversion and classify by filename/extension only')
     
     args = parser.parse_args()
     
@@ -219,7 +456,8 @@ def main():
             args.zip_path, 
             args.output_dir,
             convert_images=args.convert_images,
-            organize_files=args.organize_files
+            organize_files=args.organize_files,
+            fast=args.fast
         )
         sys.exit(0 if success else 1)
     except AssetExtractionError as e: